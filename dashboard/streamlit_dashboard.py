@@ -7,11 +7,14 @@ Run with: streamlit run streamlit_dashboard.py
 import streamlit as st
 import pandas as pd
 import json
-from datetime import datetime
-import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Page config
 st.set_page_config(
     page_title="Synthesis Tracker Dashboard",
@@ -19,80 +22,129 @@ st.set_page_config(
     layout="wide"
 )
 
+DATA_FILE = Path(__file__).parent.parent / "email_parser" / "synthesis_data.json"
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+DAY_ABBR = {d: d[:3] for d in DAYS}
+DAILY_COLUMNS = [f'daily_minutes.{d}' for d in DAYS]
+
 @st.cache_data
-def load_data():
-    """Load data from JSON file"""
-    data_file = Path(__file__).parent.parent / "email_parser" / "synthesis_data.json"
+def load_data(mtime_ns):
+    """Load data from JSON file (cached until the file's mtime changes)"""
+    raw = DATA_FILE.read_bytes()
+    return orjson.loads(raw) if orjson else json.loads(raw)
 
-    with open(data_file, 'r') as f:
-        data = json.load(f)
+def to_datetime(dates):
+    """Vectorized parse of email date strings (NaT when unparseable)"""
+    return pd.to_datetime(dates, errors='coerce', utc=True, format='mixed')
 
-    return data
+@st.cache_data
+def load_progress_df(progress_data):
+    """Weekly progress as a DataFrame: one column per day, dates parsed once"""
+    df = pd.json_normalize(progress_data).reindex(
+        columns=['email_id', 'date', 'total_weekly_minutes'] + DAILY_COLUMNS
+    ).rename(columns=dict(zip(DAILY_COLUMNS, DAYS)))
+
+    df['has_daily'] = df[DAYS].notna().any(axis=1)
+    df[DAYS] = df[DAYS].fillna(0).astype(int)
+    df['email_id'] = df['email_id'].fillna(0)
+    df['date_dt'] = to_datetime(df['date'])
+    df['week_label'] = df['date_dt'].dt.strftime('%Y-%m-%d')
+    df['active_days'] = df[DAYS].gt(0).sum(axis=1)
+    return df
 
-def parse_date(date_str):
-    """Parse email date string to datetime"""
-    try:
-        # Parse RFC 2822 format - handle both single and double digit days
-        from email.utils import parsedate_to_datetime
-        return parsedate_to_datetime(date_str)
-    except:
-        try:
-            # Fallback to manual parsing
-            return datetime.strptime(date_str[:25], '%a, %d %b %Y %H:%M:%S')
-        except:
-            return None
-
-def create_weekly_chart(progress_data):
+@st.cache_data
+def load_sessions_df(session_data):
+    """Sessions as a DataFrame with dates parsed once"""
+    df = pd.json_normalize(session_data).reindex(
+        columns=['email_id', 'date', 'day', 'time', 'duration_minutes', 'topic']
+    )
+    df['email_id'] = df['email_id'].fillna(0)
+    df['date_dt'] = to_datetime(df['date'])
+    return df
+
+@st.cache_data
+def build_session_table(sessions_df, limit=10):
+    """Build the session history table for the most recent sessions"""
+    df = sessions_df.nlargest(limit, 'email_id')
+
+    return pd.DataFrame({
+        'Date': df['date_dt'].dt.strftime('%Y-%m-%d').fillna('Unknown'),
+        'Day': df['day'].fillna(''),
+        'Time': df['time'].fillna(''),
+        'Duration (min)': df['duration_minutes'].fillna(0),
+        'Topic': df['topic'].fillna('').str.slice(0, 40)
+    }).reset_index(drop=True)
+
+@st.cache_data
+def build_progress_table(progress_df, limit=10):
+    """Build the weekly reports table for the most recent weeks"""
+    df = progress_df.nlargest(limit, 'email_id')
+
+    breakdown = df[DAYS].apply(
+        lambda row: ', '.join(f'{DAY_ABBR[d]}:{m}' for d, m in row.items() if m > 0),
+        axis=1
+    )
+
+    return pd.DataFrame({
+        'Week': df['week_label'].fillna('Unknown'),
+        'Total Minutes': df['total_weekly_minutes'].fillna(0).astype(int),
+        'Active Days': df['active_days'],
+        'Daily Breakdown': breakdown
+    }).reset_index(drop=True)
+
+@st.cache_data
+def create_weekly_chart(progress_df):
     """Create weekly activity chart"""
     # Prepare data
-    weeks = []
-    for p in progress_data:
-        date = parse_date(p.get('date', ''))
-        if date and 'total_weekly_minutes' in p:
-            weeks.append({
-                'Week': date.strftime('%Y-%m-%d'),
-                'Minutes': p['total_weekly_minutes'],
-                'Active Days': sum(1 for v in p.get('daily_minutes', {}).values() if v > 0)
-            })
-
-    if not weeks:
+    weeks = progress_df[progress_df['date_dt'].notna() & progress_df['total_weekly_minutes'].notna()]
+
+    if weeks.empty:
         return None
 
-    df = pd.DataFrame(weeks).sort_values('Week')
+    df = pd.DataFrame({
+        'Week': weeks['week_label'],
+        'Minutes': weeks['total_weekly_minutes'].astype(int),
+        'Active Days': weeks['active_days']
+    }).sort_values('Week')
 
     # Create bar chart
-    fig = px.bar(
-        df,
-        x='Week',
-        y='Minutes',
-        hover_data=['Active Days'],
+    fig = go.Figure(go.Bar(
+        x=df['Week'],
+        y=df['Minutes'],
+        customdata=df[['Active Days']],
+        marker=dict(
+            color=df['Minutes'],
+            colorscale='Blues',
+            showscale=True,
+            colorbar=dict(title='Total Minutes')
+        ),
+        hovertemplate='Week Starting=%{x}<br>Total Minutes=%{y}<br>'
+                      'Active Days=%{customdata[0]}<extra></extra>'
+    ))
+
+    fig.update_layout(
         title='Weekly Activity (Minutes)',
-        labels={'Minutes': 'Total Minutes', 'Week': 'Week Starting'},
-        color='Minutes',
-        color_continuous_scale='Blues'
+        xaxis_title='Week Starting',
+        yaxis_title='Total Minutes',
+        height=400
     )
-
-    fig.update_layout(height=400)
     return fig
 
-def create_daily_breakdown(progress_data):
+@st.cache_data
+def create_daily_breakdown(progress_df):
     """Create daily activity heatmap"""
     # Get most recent week with daily data
-    recent = None
-    for p in sorted(progress_data, key=lambda x: x.get('email_id', 0), reverse=True):
-        if 'daily_minutes' in p:
-            recent = p
-            break
+    weeks = progress_df[progress_df['has_daily']]
 
-    if not recent or not recent.get('daily_minutes'):
+    if weeks.empty:
         return None
 
-    days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    values = [recent['daily_minutes'].get(d, 0) for d in days]
+    recent = weeks.loc[weeks['email_id'].idxmax()]
+    values = recent[DAYS].tolist()
 
     fig = go.Figure(data=[
         go.Bar(
-            x=days,
+            x=DAYS,
             y=values,
             marker_color=['green' if v > 0 else 'lightgray' for v in values],
             text=values,
@@ -100,8 +152,8 @@ def create_daily_breakdown(progress_data):
         )
     ])
 
-    date = parse_date(recent.get('date', ''))
-    title_date = date.strftime('%B %d, %Y') if date else 'Most Recent Week'
+    date = recent['date_dt']
+    title_date = date.strftime('%B %d, %Y') if pd.notna(date) else 'Most Recent Week'
 
     fig.update_layout(
         title=f'Daily Activity - Week of {title_date}',
@@ -111,55 +163,54 @@ def create_daily_breakdown(progress_data):
 
     return fig
 
-def create_session_timeline(session_data):
+@st.cache_data
+def create_session_timeline(sessions_df):
     """Create session timeline"""
-    sessions = []
-    for s in session_data:
-        date = parse_date(s.get('date', ''))
-        if date and 'duration_minutes' in s:
-            sessions.append({
-                'Date': date,
-                'Duration': s['duration_minutes'],
-                'Day': s.get('day', 'Unknown'),
-                'Time': s.get('time', 'Unknown'),
-                'Topic': s.get('topic', 'No topic')[:30]
-            })
-
-    if not sessions:
+    sessions = sessions_df[sessions_df['date_dt'].notna() & sessions_df['duration_minutes'].notna()]
+
+    if sessions.empty:
         return None
 
-    df = pd.DataFrame(sessions).sort_values('Date')
+    df = pd.DataFrame({
+        'Date': sessions['date_dt'],
+        'Duration': sessions['duration_minutes'],
+        'Day': sessions['day'].fillna('Unknown'),
+        'Time': sessions['time'].fillna('Unknown'),
+        'Topic': sessions['topic'].fillna('No topic').str.slice(0, 30)
+    }).sort_values('Date')
+
+    # WebGL scatter keeps rendering fast as the session history grows
+    fig = go.Figure(go.Scattergl(
+        mode='markers',
+        x=df['Date'],
+        y=df['Duration'],
+        customdata=df[['Day', 'Time', 'Topic']],
+        marker=dict(
+            size=df['Duration'],
+            sizemode='area',
+            sizeref=2.0 * df['Duration'].max() / (20 ** 2),
+            color=df['Duration'],
+            colorscale='Viridis',
+            showscale=True,
+            colorbar=dict(title='Duration (minutes)')
+        ),
+        hovertemplate='Date=%{x}<br>Duration (minutes)=%{y}<br>Day=%{customdata[0]}<br>'
+                      'Time=%{customdata[1]}<br>Topic=%{customdata[2]}<extra></extra>'
+    ))
 
-    fig = px.scatter(
-        df,
-        x='Date',
-        y='Duration',
-        size='Duration',
-        hover_data=['Day', 'Time', 'Topic'],
+    fig.update_layout(
         title='Individual Sessions',
-        labels={'Duration': 'Duration (minutes)'},
-        color='Duration',
-        color_continuous_scale='Viridis'
+        xaxis_title='Date',
+        yaxis_title='Duration (minutes)',
+        height=400
     )
-
-    fig.update_layout(height=400)
     return fig
 
-def main():
-    st.title("🧠 Synthesis Tutor Activity Dashboard")
-
-    # Load data
-    try:
-        data = load_data()
-    except FileNotFoundError:
-        st.error("No data found. Run `python3 synthesis_tracker.py` first to generate data.")
-        return
-
-    # Summary metrics
+@st.fragment
+def render_summary(summary, progress_df):
+    """Summary metrics and last activity banner"""
     col1, col2, col3, col4 = st.columns(4)
 
-    summary = data.get('summary', {})
-
     with col1:
         st.metric(
             "Total Weeks Tracked",
@@ -185,81 +236,82 @@ def main():
         )
 
     # Show last activity info
-    progress = sorted(data.get('progress', []), key=lambda x: x.get('email_id', 0), reverse=True)
-    if progress and progress[0].get('total_weekly_minutes') > 0:
-        last_week = progress[0]
-        last_date = parse_date(last_week.get('date', ''))
-        if last_date:
-            st.info(f"📅 Last activity: Week of {last_date.strftime('%B %d, %Y')} - {last_week.get('total_weekly_minutes', 0)} minutes")
-
-    # Charts
-    st.header("📊 Activity Trends")
-
-    # Weekly activity chart
-    weekly_chart = create_weekly_chart(data.get('progress', []))
+    if not progress_df.empty:
+        last_week = progress_df.loc[progress_df['email_id'].idxmax()]
+        minutes = last_week['total_weekly_minutes']
+        if pd.notna(minutes) and minutes > 0 and pd.notna(last_week['date_dt']):
+            st.info(f"📅 Last activity: Week of {last_week['date_dt'].strftime('%B %d, %Y')} - {int(minutes)} minutes")
+
+@st.fragment
+def render_weekly_chart(progress_df):
+    """Weekly activity chart"""
+    weekly_chart = create_weekly_chart(progress_df)
     if weekly_chart:
         st.plotly_chart(weekly_chart, use_container_width=True)
 
-    # Two column layout for other charts
+@st.fragment
+def render_daily_and_session_charts(progress_df, sessions_df):
+    """Daily breakdown and session timeline, side by side"""
     col1, col2 = st.columns(2)
 
     with col1:
         # Daily breakdown
-        daily_chart = create_daily_breakdown(data.get('progress', []))
+        daily_chart = create_daily_breakdown(progress_df)
         if daily_chart:
             st.plotly_chart(daily_chart, use_container_width=True)
 
     with col2:
         # Session timeline
-        session_chart = create_session_timeline(data.get('sessions', []))
+        session_chart = create_session_timeline(sessions_df)
         if session_chart:
             st.plotly_chart(session_chart, use_container_width=True)
 
+@st.fragment
+def render_session_history(sessions_df):
+    """Session history table"""
+    if not sessions_df.empty:
+        st.dataframe(build_session_table(sessions_df), use_container_width=True)
+
+@st.fragment
+def render_weekly_reports(progress_df):
+    """Weekly reports table"""
+    if not progress_df.empty:
+        st.dataframe(build_progress_table(progress_df), use_container_width=True)
+
+def main():
+    st.title("🧠 Synthesis Tutor Activity Dashboard")
+
+    # Load data
+    try:
+        data = load_data(DATA_FILE.stat().st_mtime_ns)
+    except FileNotFoundError:
+        st.error("No data found. Run `python3 synthesis_tracker.py` first to generate data.")
+        return
+
+    # Convert once; every chart and table below works on these frames
+    progress_df = load_progress_df(data.get('progress', []))
+    sessions_df = load_sessions_df(data.get('sessions', []))
+
+    # Each section is a fragment, so interacting with one only reruns that section
+    render_summary(data.get('summary', {}), progress_df)
+
+    # Charts
+    st.header("📊 Activity Trends")
+    render_weekly_chart(progress_df)
+    render_daily_and_session_charts(progress_df, sessions_df)
+
     # Recent activity details
     st.header("📝 Activity Details")
 
     tab1, tab2 = st.tabs(["Session History (Jul-Aug)", "Weekly Reports (Jun-Sep)"])
 
     with tab1:
-        sessions = sorted(
-            data.get('sessions', []),
-            key=lambda x: x.get('email_id', 0),
-            reverse=True
-        )[:10]
-
-        if sessions:
-            session_df = pd.DataFrame([
-                {
-                    'Date': parse_date(s.get('date', '')).strftime('%Y-%m-%d') if parse_date(s.get('date', '')) else 'Unknown',
-                    'Day': s.get('day', ''),
-                    'Time': s.get('time', ''),
-                    'Duration (min)': s.get('duration_minutes', 0),
-                    'Topic': s.get('topic', '')[:40]
-                }
-                for s in sessions
-            ])
-            st.dataframe(session_df, use_container_width=True)
+        render_session_history(sessions_df)
 
     with tab2:
-        progress = sorted(
-            data.get('progress', []),
-            key=lambda x: x.get('email_id', 0),
-            reverse=True
-        )[:10]
-
-        if progress:
-            progress_df = pd.DataFrame([
-                {
-                    'Week': parse_date(p.get('date', '')).strftime('%Y-%m-%d') if parse_date(p.get('date', '')) else 'Unknown',
-                    'Total Minutes': p.get('total_weekly_minutes', 0),
-                    'Active Days': sum(1 for v in p.get('daily_minutes', {}).values() if v > 0),
-                    'Daily Breakdown': ', '.join([f"{d[:3]}:{m}" for d, m in p.get('daily_minutes', {}).items() if m > 0])
-                }
-                for p in progress
-            ])
-            st.dataframe(progress_df, use_container_width=True)
-
-    # Refresh button
+        render_weekly_reports(progress_df)
+
+    # Refresh button (full rerun, since every section depends on the loaded data)
     st.sidebar.header("⚙️ Controls")
     if st.sidebar.button("🔄 Refresh Data"):
         st.cache_data.clear()
@@ -271,4 +323,4 @@ def main():
     )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -4,18 +4,103 @@ Synthesis Tracker - Extract activity data from Synthesis Tutor emails
 """
 
 import imaplib
-import email
-from email.header import decode_header
+import base64
+import quopri
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
 import socket
+import ssl
 import json
+import heapq
 import re
-from datetime import datetime
-from bs4 import BeautifulSoup
+from datetime import date, datetime
+from lxml import etree, html as lxml_html
 import sys
 import argparse
-
-# Set timeout for connections
-socket.setdefaulttimeout(30)
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+from operator import itemgetter
+
+# orjson serializes several times faster; the stdlib json module is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Inline style of the gray labels holding each day's minutes
+_GRAY_TEXT = 'color:rgb(156,163,175)'
+_UTF8_HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+_GRAY_DIVS = etree.XPath(f'//div[contains(@style, "{_GRAY_TEXT}")]')
+_GRAY_DIV_RE = re.compile(
+    r'<div\b[^>]*?\sstyle="[^"]*' + re.escape(_GRAY_TEXT) + r'[^"]*"[^>]*>([^<]*)</div>'
+)
+
+# Session line, e.g. "MONDAY, 3:38PM - 33.1 MINUTES"
+_SESSION_RE = re.compile(
+    r'(\w+DAY),\s*(\d{1,2}:\d{2}[APap][Mm])\s*[-–]\s*([\d.]+)\s*[Mm][Ii][Nn][Uu][Tt][Ee][Ss]',
+    re.IGNORECASE
+)
+
+# Sender and subject prefixes of the emails we track
+SENDER = "no-reply@tutor.synthesis.com"
+SESSION_SUBJECT = "Zoey's Synthesis Session:"
+PROGRESS_SUBJECT = "Zoey's progress with Synthesis Tutor"
+
+# Connection timeout in seconds (per IMAP socket, not process-wide)
+IMAP_TIMEOUT = 30
+
+# Seconds between NOOPs while waiting in --interval mode; servers drop idle
+# sessions after 30 minutes at the earliest (RFC 3501)
+NOOP_INTERVAL = 5 * 60
+
+# Parallel IMAP connections used to fetch emails; stays well below the
+# per-account connection caps of common servers (~10-15)
+FETCH_WORKERS = 4
+
+# Parsed results, also read back so already-seen emails are not fetched again
+DATA_FILE = 'synthesis_data.json'
+
+# Messages per FETCH command when downloading email bodies
+FETCH_BATCH_SIZE = 50
+
+# Body parts fetched when the caller does not say which it needs
+TEXT_KINDS = ('text', 'html')
+
+# TLS context shared by every IMAP connection
+_SSL_CONTEXT = ssl.create_default_context()
+_SSL_CONTEXT.minimum_version = ssl.TLSVersion.TLSv1_2
+
+# Header-only parser for the search scan; skips the body/MIME machinery
+_HEADER_PARSER = BytesHeaderParser()
+
+# Tokens of an IMAP response: parens, quoted strings and atoms
+_TOKEN_RE = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_LITERAL_RE = re.compile(rb'\{\d+\}$')
+_SECTION_RE = re.compile(rb'BODY\[([^\]]*)\]')
+_UID_RE = re.compile(rb'UID (\d+)')
+_MESSAGE_START_RE = re.compile(rb'\d+ \(')
+
+
+def _timestamp(date_header):
+    """Epoch seconds of an email Date header (0 when missing or malformed)"""
+    try:
+        return int(parsedate_to_datetime(date_header).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return 0
+
+
+def _write_json(path, data):
+    """Write data as indented JSON"""
+    if orjson:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
 
 
 class SynthesisTracker:
@@ -24,19 +109,37 @@ class SynthesisTracker:
         self.username = username
         self.password = password
         self.imap = None
+        self.uidvalidity = None
+        self.highestmodseq = None
 
     def connect(self):
-        """Connect to IMAP server"""
+        """Connect to IMAP server, reusing the current session if it is still alive"""
+        if self.imap:
+            try:
+                self.imap.noop()
+                return True
+            except (imaplib.IMAP4.error, OSError):
+                # Dropped by the server (or the network); log in again below
+                self.imap = None
+
         try:
             print(f"Connecting to {self.server}...")
-            self.imap = imaplib.IMAP4_SSL(self.server, 993)
-            self.imap.login(self.username, self.password)
+            self.imap = self._make_conn()
             print("✓ Connected successfully")
             return True
         except Exception as e:
             print(f"✗ Connection failed: {e}")
             return False
 
+    def _make_conn(self):
+        """Open a logged-in IMAP connection"""
+        imap = imaplib.IMAP4_SSL(
+            self.server, 993, ssl_context=_SSL_CONTEXT, timeout=IMAP_TIMEOUT
+        )
+        imap.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        imap.login(self.username, self.password)
+        return imap
+
     def disconnect(self):
         """Disconnect from IMAP server"""
         if self.imap:
@@ -46,54 +149,107 @@ class SynthesisTracker:
                 print("Disconnected from server")
             except:
                 pass
+            self.imap = None
 
-    def search_emails(self, limit=2000):
-        """Find all Synthesis emails"""
+    def watch(self, interval, **kwargs):
+        """Run process_all every `interval` seconds over one IMAP session"""
         try:
-            result, data = self.imap.select("INBOX")
-            total_msgs = int(data[0].decode())
-            print(f"Searching {min(limit, total_msgs)} recent messages...")
+            while True:
+                try:
+                    self.process_all(keep_connection=True, **kwargs)
+                except Exception as e:
+                    # One bad email or network blip must not end the loop;
+                    # start the next check on a fresh session
+                    print(f"Error during check: {e}")
+                    self.disconnect()
+
+                # Keep the session alive with NOOPs until the next check;
+                # connect() logs in again if the server dropped it anyway
+                next_run = time.monotonic() + interval
+                while True:
+                    remaining = next_run - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(remaining, NOOP_INTERVAL))
+                    if self.imap:
+                        try:
+                            self.imap.noop()
+                        except (imaplib.IMAP4.error, OSError):
+                            self.imap = None
+        finally:
+            self.disconnect()
 
-            start_uid = max(1, total_msgs - limit)
-            end_uid = total_msgs
+    def search_emails(self, limit=2000, since=None, previous=None):
+        """Find all Synthesis emails (None, None if the search failed)"""
+        previous = previous or {}
+        try:
+            # CONDSTORE (RFC 7162) reports a mod-sequence that grows with every change
+            try:
+                result, data = self.imap.select("INBOX (CONDSTORE)")
+            except imaplib.IMAP4.error:
+                result = None
+            if result != 'OK':
+                result, data = self.imap.select("INBOX")
+            total_msgs = int(data[0].decode())
+            _, validity = self.imap.response('UIDVALIDITY')
+            self.uidvalidity = int(validity[0]) if validity and validity[0] else None
+            _, modseq = self.imap.response('HIGHESTMODSEQ')
+            self.highestmodseq = int(modseq[0]) if modseq and modseq[0] else None
+
+            # Given previous results of the same mailbox, only UIDs above its
+            # last_uid are searched, and nothing at all if its mod-sequence is unchanged.
+            # Otherwise the last `limit` messages, or everything since `since`.
+            same_mailbox = self._same_mailbox(previous)
+            last_uid = previous.get('last_uid') if same_mailbox else None
+            unchanged = (
+                same_mailbox and not since and self.highestmodseq is not None
+                and previous.get('highestmodseq') == self.highestmodseq
+            )
+            if unchanged:
+                print("Mailbox unchanged since the last run")
+            elif last_uid and not since:
+                print(f"Searching messages after UID {last_uid}...")
+                window = f"UID {last_uid + 1}:*"
+            elif since:
+                print(f"Searching messages since {since:%Y-%m-%d}...")
+                window = f"SINCE {since:%d-%b-%Y}"
+            else:
+                print(f"Searching {min(limit, total_msgs)} recent messages...")
+                window = f"{max(1, total_msgs - limit)}:{total_msgs}"
 
             session_emails = []
             progress_emails = []
 
-            # Batch fetch headers
-            batch_size = 50
-            for batch_start in range(start_uid, end_uid + 1, batch_size):
-                batch_end = min(batch_start + batch_size - 1, end_uid)
-
-                try:
-                    result, data = self.imap.fetch(
-                        f"{batch_start}:{batch_end}",
-                        "(BODY[HEADER.FIELDS (FROM SUBJECT DATE)])"
-                    )
-
-                    if result == 'OK' and data:
-                        for i in range(0, len(data), 2):
-                            if data[i] and isinstance(data[i], tuple) and len(data[i]) > 1:
-                                headers = email.message_from_bytes(data[i][1])
-
-                                from_addr = headers.get("From", "")
-                                if "no-reply@tutor.synthesis.com" not in from_addr.lower():
-                                    continue
-
-                                subject = self._decode_header(headers.get("Subject", ""))
-                                msg_id = batch_start + (i // 2)
-                                date = headers.get("Date", "")
-
-                                if "Zoey's Synthesis Session:" in subject:
-                                    session_emails.append({
-                                        'id': msg_id, 'subject': subject, 'date': date
-                                    })
-                                elif "Zoey's progress with Synthesis Tutor" in subject:
-                                    progress_emails.append({
-                                        'id': msg_id, 'subject': subject, 'date': date
-                                    })
-                except Exception as e:
-                    continue
+            if unchanged:
+                session_uids = [r['email_id'] for r in previous.get('sessions', [])]
+                progress_uids = [r['email_id'] for r in previous.get('progress', [])]
+
+                session_emails = [{'id': uid} for uid in session_uids]
+                progress_emails = [{'id': uid} for uid in progress_uids]
+
+            # Let the server filter by sender and subject, returning matching UIDs only
+            elif total_msgs:
+                session_uids = self._search_uids(window, SESSION_SUBJECT)
+                progress_uids = self._search_uids(window, PROGRESS_SUBJECT)
+
+                # "n:*" always matches the newest message, even when it is below n
+                if last_uid and not since:
+                    session_uids = [uid for uid in session_uids if uid > last_uid]
+                    progress_uids = [uid for uid in progress_uids if uid > last_uid]
+
+                # Carry the previous emails over, so a --since window never drops
+                # older history. Some may sit above last_uid when an older email
+                # failed to fetch, so skip UIDs that are already known.
+                if same_mailbox:
+                    known_sessions = [r['email_id'] for r in previous.get('sessions', [])]
+                    known_progress = [r['email_id'] for r in previous.get('progress', [])]
+                    known = set(known_sessions) | set(known_progress)
+                    session_uids = sorted(known_sessions + [uid for uid in session_uids if uid not in known])
+                    progress_uids = sorted(known_progress + [uid for uid in progress_uids if uid not in known])
+
+                session_emails = [{'id': uid} for uid in session_uids]
+                seen = set(session_uids)
+                progress_emails = [{'id': uid} for uid in progress_uids if uid not in seen]
 
             print(f"Found {len(session_emails)} session emails")
             print(f"Found {len(progress_emails)} weekly progress emails")
@@ -101,63 +257,133 @@ class SynthesisTracker:
 
         except Exception as e:
             print(f"Error searching: {e}")
-            return [], []
+            return None, None
 
-    def fetch_email(self, email_id):
-        """Fetch full email content"""
+    def _search_uids(self, window, subject):
+        """UIDs of Synthesis emails matching window whose subject contains subject"""
+        result, data = self.imap.uid(
+            'SEARCH', None, window, 'FROM', f'"{SENDER}"', 'SUBJECT', f'"{subject}"'
+        )
+        if result != 'OK' or not data or not data[0]:
+            return []
+        return [int(uid) for uid in data[0].split()]
+
+    def fetch_email(self, email_id, imap=None, kinds=TEXT_KINDS):
+        """Fetch one email's headers and text parts"""
+        return self.fetch_batch([email_id], imap, {email_id: kinds}).get(email_id)
+
+    def fetch_batch(self, email_ids, imap=None, kinds=None):
+        """Fetch headers and text parts of several emails, keyed by UID"""
+        # kinds optionally maps a UID to the parts it needs ('text' and/or 'html');
+        # anything else, attachments included, is left on the server
+        kinds = kinds or {}
+        imap = imap or self.imap
+        contents = {}
         try:
-            result, msg_data = self.imap.fetch(str(email_id), "(RFC822)")
+            # Locate the text/plain and text/html parts of every message
+            result, data = imap.uid('FETCH', ','.join(map(str, email_ids)), "(BODYSTRUCTURE)")
             if result != 'OK':
-                return None
+                return contents
+
+            layouts = {}
+            for message in self._split_messages(data):
+                response = self._parse_response(message)[-1]
+                fields = [str(f).upper() for f in response]
+                uid = int(response[fields.index('UID') + 1])
+                parts = self._text_parts(response[fields.index('BODYSTRUCTURE') + 1])
+                wanted = kinds.get(uid, TEXT_KINDS)
+                # Fall back to whatever text part exists (e.g. single-part HTML)
+                layouts[uid] = {kind: part for kind, part in parts.items() if kind in wanted} or parts
+
+            # Messages with the same part layout share a single FETCH
+            groups = {}
+            for uid, parts in layouts.items():
+                sections = tuple(sorted(part['section'] for part in parts.values()))
+                groups.setdefault(sections, []).append(uid)
+
+            for sections, uids in groups.items():
+                items = ''.join(f" BODY.PEEK[{section}]" for section in sections)
+                result, data = imap.uid(
+                    'FETCH', ','.join(map(str, uids)),
+                    f"(BODY.PEEK[HEADER.FIELDS (SUBJECT DATE)]{items})"
+                )
+                if result != 'OK':
+                    continue
+
+                for message in self._split_messages(data):
+                    uid = self._message_uid(message)
+                    if uid in layouts:
+                        contents[uid] = self._build_content(
+                            self._message_literals(message), layouts[uid]
+                        )
+        except Exception as e:
+            print(f"Error fetching emails {email_ids[0]}-{email_ids[-1]}: {e}")
 
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
+        return contents
 
-            # Extract content and metadata
-            content = {
-                'html': None,
-                'text': None,
-                'date': msg.get('Date', ''),
-                'subject': self._decode_header(msg.get('Subject', ''))
-            }
+    def fetch_emails(self, email_ids, kinds=None, workers=FETCH_WORKERS, batch_size=FETCH_BATCH_SIZE):
+        """Yield one {uid: content} dict per batch, fetched by parallel workers"""
+        if not email_ids:
+            return
 
-            if msg.is_multipart():
-                for part in msg.walk():
-                    ct = part.get_content_type()
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        try:
-                            decoded = payload.decode('utf-8', errors='ignore')
-                            if ct == "text/html":
-                                content['html'] = decoded
-                            elif ct == "text/plain":
-                                content['text'] = decoded
-                        except:
-                            continue
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    content['text'] = payload.decode('utf-8', errors='ignore')
+        # A single batch is cheaper on the session we are already logged in to
+        if len(email_ids) <= batch_size and self.imap:
+            yield self.fetch_batch(email_ids, self.imap, kinds)
+            return
 
-            return content
-        except Exception as e:
-            print(f"Error fetching email {email_id}: {e}")
-            return None
+        # Spread the batches so every worker gets a share
+        batch_size = max(1, min(batch_size, -(-len(email_ids) // workers)))
+        batches = [email_ids[i:i + batch_size] for i in range(0, len(email_ids), batch_size)]
+
+        # imaplib connections are not thread-safe, so each worker logs in on its own
+        local = threading.local()
+        conns = []
+        lock = threading.Lock()
+
+        def fetch(batch):
+            if not hasattr(local, 'imap'):
+                try:
+                    local.imap = self._make_conn()
+                    local.imap.select("INBOX", readonly=True)
+                except Exception as e:
+                    print(f"Error opening worker connection: {e}")
+                    local.imap = None
+                with lock:
+                    conns.append(local.imap)
+            if local.imap is None:
+                return {}
+            return self.fetch_batch(batch, local.imap, kinds)
+
+        try:
+            # At most `workers` batches are held at a time, so callers that parse
+            # and drop each batch never keep every body in memory at once
+            with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+                pending = deque()
+                for batch in batches:
+                    pending.append(pool.submit(fetch, batch))
+                    if len(pending) >= workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+        finally:
+            for imap in conns:
+                if imap:
+                    try:
+                        imap.logout()
+                    except Exception:
+                        pass
 
     def parse_session(self, content, subject, date):
         """Parse session email"""
-        data = {'subject': subject, 'date': date, 'type': 'session'}
+        data = {'subject': subject, 'date': date, 'timestamp': _timestamp(date), 'type': 'session'}
 
         # Extract session topic
-        if "Zoey's Synthesis Session:" in subject:
-            data['topic'] = subject.split("Zoey's Synthesis Session:")[1].strip()
-
-        # Parse session details from text
-        text = content.get('text', '')
-        match = re.search(
-            r'(\w+DAY),\s*(\d{1,2}:\d{2}[APap][Mm])\s*[-–]\s*([\d.]+)\s*[Mm][Ii][Nn][Uu][Tt][Ee][Ss]',
-            text, re.IGNORECASE
-        )
+        if SESSION_SUBJECT in subject:
+            data['topic'] = subject.split(SESSION_SUBJECT)[1].strip()
+
+        # Parse session details from text (HTML-only emails carry the same line)
+        text = content.get('text') or content.get('html') or ''
+        match = _SESSION_RE.search(text)
         if match:
             data['day'] = match.group(1).capitalize()
             data['time'] = match.group(2).lower()
@@ -167,20 +393,34 @@ class SynthesisTracker:
 
     def parse_progress(self, content, subject, date):
         """Parse weekly progress email"""
-        data = {'subject': subject, 'date': date, 'type': 'progress'}
+        data = {'subject': subject, 'date': date, 'timestamp': _timestamp(date), 'type': 'progress'}
 
-        if not content.get('html'):
+        # Emails without the gray minute labels have nothing to parse
+        if not content.get('html') or _GRAY_TEXT not in content['html']:
             return data
 
-        soup = BeautifulSoup(content['html'], 'html.parser')
+        html = content['html']
+
+        # Plain gray <div>s are read straight off the markup. Anything the regex
+        # cannot vouch for (nested tags, entities, other elements) goes to lxml.
+        texts = _GRAY_DIV_RE.findall(html)
+        if len(texts) != html.count(_GRAY_TEXT) or any('&' in t for t in texts):
+            # lxml refuses str input that carries an XML encoding declaration,
+            # so hand it UTF-8 bytes with the encoding stated explicitly
+            try:
+                tree = lxml_html.fromstring(html.encode('utf-8'), parser=_UTF8_HTML_PARSER)
+            except (ValueError, etree.ParserError) as e:
+                print(f"Error parsing progress HTML: {e}")
+                return data
+            texts = [''.join(s.strip() for s in div.itertext()) for div in _GRAY_DIVS(tree)]
 
         # Parse Daily Active Minutes
         daily_minutes = {}
         days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
 
         minutes_divs = []
-        for div in soup.find_all('div', style=lambda x: x and 'color:rgb(156,163,175)' in x):
-            text = div.get_text(strip=True)
+        for text in texts:
+            text = text.strip()
             if text.isdigit() or text == '':
                 minutes_divs.append(int(text) if text else 0)
 
@@ -192,86 +432,104 @@ class SynthesisTracker:
 
         return data
 
-    def process_all(self, save_to_file=True):
+    def process_all(self, save_to_file=True, keep_connection=False, reuse=True, since=None):
         """Process all emails and return/save results"""
         if not self.connect():
             return None
 
         try:
-            sessions, progress = self.search_emails()
+            # Emails already parsed into synthesis_data.json are not fetched again
+            previous = self._load_previous() if reuse else {}
+            sessions, progress = self.search_emails(since=since, previous=previous)
+            if sessions is None:
+                # Writing now would replace the accumulated history with nothing
+                print("✗ Search failed, keeping the existing data")
+                return None
+            cached = self._cached_records(previous)
 
             results = {
                 'sessions': [],
                 'progress': [],
                 'summary': {},
+                'uidvalidity': self.uidvalidity,
+                'last_uid': None,
+                'highestmodseq': None,
                 'last_updated': datetime.now().isoformat()
             }
 
+            # Fetch every new matching email in parallel and parse each batch as
+            # it arrives, so only a few batches of bodies are held at a time.
+            # Sessions are parsed from the plain text, progress from the HTML.
+            kinds = {e['id']: ('text',) for e in sessions}
+            kinds.update({e['id']: ('html',) for e in progress})
+            new_ids = [e['id'] for e in sessions + progress if e['id'] not in cached]
+            if cached:
+                print(f"Reusing {len(kinds) - len(new_ids)} already parsed emails")
+
+            parsed_emails = dict(cached)
+            for fetched in self.fetch_emails(new_ids, kinds):
+                for email_id, content in fetched.items():
+                    parse = self.parse_session if kinds[email_id] == ('text',) else self.parse_progress
+                    # Use the actual email date from the fetched content
+                    parsed = parse(content, content.get('subject', ''), content.get('date', ''))
+                    parsed['email_id'] = email_id
+                    parsed_emails[email_id] = parsed
+
+            # Running totals for the summary, kept while the records are collected
+            total_session_min = 0
+            total_weekly_min = 0
+
             # Process all session emails
             print("\nProcessing session emails...")
             for email_info in sessions:
-                content = self.fetch_email(email_info['id'])
-                if content:
-                    # Use the actual email date from the fetched content
-                    parsed = self.parse_session(
-                        content,
-                        content.get('subject', email_info['subject']),
-                        content.get('date', email_info['date'])
-                    )
-                    parsed['email_id'] = email_info['id']
+                parsed = parsed_emails.get(email_info['id'])
+                if parsed:
                     results['sessions'].append(parsed)
-
                     duration = parsed.get('duration_minutes', 0)
+                    total_session_min += duration
                     if duration:
                         print(f"  ✓ {parsed.get('day', '?')} - {duration:.1f} min")
 
             # Process weekly progress
             print("\nProcessing weekly progress emails...")
             for email_info in progress:
-                content = self.fetch_email(email_info['id'])
-                if content:
-                    # Use the actual email date from the fetched content
-                    parsed = self.parse_progress(
-                        content,
-                        content.get('subject', email_info['subject']),
-                        content.get('date', email_info['date'])
-                    )
-                    parsed['email_id'] = email_info['id']
+                parsed = parsed_emails.get(email_info['id'])
+                if parsed:
                     results['progress'].append(parsed)
-
                     total = parsed.get('total_weekly_minutes', 0)
+                    total_weekly_min += total
                     print(f"  ✓ Week total: {total} min")
 
+            # Emails that failed to fetch must be searched for again next time,
+            # so last_uid stops just below the first of them
+            kept = {r['email_id'] for r in results['sessions'] + results['progress']}
+            missing = [e['id'] for e in sessions + progress if e['id'] not in kept]
+            results['last_uid'] = min(missing) - 1 if missing else max(kept, default=None)
+
+            # Only a complete run may let the next one skip an unchanged mailbox
+            if not missing:
+                results['highestmodseq'] = self.highestmodseq
+
             # Calculate summary
             if results['sessions']:
-                total_session_min = sum(
-                    s.get('duration_minutes', 0) for s in results['sessions']
-                )
                 results['summary']['total_session_minutes'] = total_session_min
                 results['summary']['avg_session_minutes'] = total_session_min / len(results['sessions'])
                 results['summary']['session_count'] = len(results['sessions'])
 
             if results['progress']:
-                total_weekly_min = sum(
-                    p.get('total_weekly_minutes', 0) for p in results['progress']
-                )
                 results['summary']['total_weekly_minutes'] = total_weekly_min
                 results['summary']['avg_weekly_minutes'] = total_weekly_min / len(results['progress'])
                 results['summary']['week_count'] = len(results['progress'])
 
-                # Calculate rolling averages
-                sorted_progress = sorted(results['progress'], key=lambda x: x.get('date', ''), reverse=True)
+                # Calculate rolling averages (only the most recent weeks are needed)
+                sorted_progress = heapq.nlargest(4, results['progress'], key=itemgetter('timestamp'))
 
                 # Last 4 weeks average
-                last_4_weeks = sorted_progress[:4]
-                if last_4_weeks:
-                    last_4_weeks_minutes = sum(p.get('total_weekly_minutes', 0) for p in last_4_weeks)
-                    results['summary']['last_4_weeks_avg'] = last_4_weeks_minutes / len(last_4_weeks)
-                else:
-                    results['summary']['last_4_weeks_avg'] = 0
+                last_4_weeks_minutes = sum(p.get('total_weekly_minutes', 0) for p in sorted_progress)
+                results['summary']['last_4_weeks_avg'] = last_4_weeks_minutes / len(sorted_progress)
 
                 # Last 7 days calculation (from most recent week's daily data)
-                if sorted_progress and sorted_progress[0].get('daily_minutes'):
+                if sorted_progress[0].get('daily_minutes'):
                     daily_data = sorted_progress[0]['daily_minutes']
                     last_7_days_total = sum(daily_data.values())
                     results['summary']['last_7_days_total'] = last_7_days_total
@@ -292,9 +550,8 @@ class SynthesisTracker:
 
             # Save to file
             if save_to_file:
-                with open('synthesis_data.json', 'w') as f:
-                    json.dump(results, f, indent=2)
-                print(f"\n✓ Saved to synthesis_data.json")
+                _write_json(DATA_FILE, results)
+                print(f"\n✓ Saved to {DATA_FILE}")
 
                 # Generate Home Assistant metrics file
                 self.generate_ha_metrics(results)
@@ -305,7 +562,37 @@ class SynthesisTracker:
             return results
 
         finally:
-            self.disconnect()
+            # A kept session lets the next call skip the TLS handshake and login
+            if not keep_connection:
+                self.disconnect()
+
+    def _load_previous(self):
+        """Results of the previous run from synthesis_data.json, if any"""
+        try:
+            with open(DATA_FILE, 'rb') as f:
+                return orjson.loads(f.read()) if orjson else json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _same_mailbox(self, previous):
+        """Whether previous results used the current UIDs
+
+        The server may renumber UIDs, announcing it with a new UIDVALIDITY.
+        """
+        return self.uidvalidity is not None and previous.get('uidvalidity') == self.uidvalidity
+
+    def _cached_records(self, previous):
+        """Previously parsed records keyed by UID, when their UIDs still hold"""
+        if not self._same_mailbox(previous):
+            return {}
+
+        records = {}
+        for record in previous.get('sessions', []) + previous.get('progress', []):
+            if 'email_id' in record:
+                # Files written before timestamps were stored lack them
+                record.setdefault('timestamp', _timestamp(record.get('date', '')))
+                records[record['email_id']] = record
+        return records
 
     def generate_ha_metrics(self, results):
         """Generate Home Assistant compatible metrics file"""
@@ -314,37 +601,31 @@ class SynthesisTracker:
         # Calculate daily averages from the most recent weeks of data
         progress_data = results.get('progress', [])
 
-        # Sort by date (most recent first)
-        sorted_progress = sorted(progress_data, key=lambda x: x.get('email_id', 0), reverse=True)
+        # Most recent 4 weeks first (same ordering as the summary)
+        sorted_progress = heapq.nlargest(4, progress_data, key=itemgetter('timestamp'))
 
-        # Calculate 4-week daily average
-        total_4week = 0
-        days_4week = 0
-        for week in sorted_progress[:4]:
-            daily_minutes = week.get('daily_minutes', {})
-            for day, minutes in daily_minutes.items():
+        # Daily averages over active days, for the last 4 and last 2 weeks in one pass
+        total_4week = days_4week = 0
+        total_2week = days_2week = 0
+        weekly_2week = 0
+        for i, week in enumerate(sorted_progress):
+            for minutes in week.get('daily_minutes', {}).values():
                 if minutes > 0:
                     total_4week += minutes
                     days_4week += 1
+                    if i < 2:
+                        total_2week += minutes
+                        days_2week += 1
+            if i < 2:
+                weekly_2week += week.get('total_weekly_minutes', 0)
 
         avg_daily_4weeks = round(total_4week / days_4week, 1) if days_4week > 0 else 0
-
-        # Calculate 2-week daily average
-        total_2week = 0
-        days_2week = 0
-        for week in sorted_progress[:2]:
-            daily_minutes = week.get('daily_minutes', {})
-            for day, minutes in daily_minutes.items():
-                if minutes > 0:
-                    total_2week += minutes
-                    days_2week += 1
-
         avg_daily_2weeks = round(total_2week / days_2week, 1) if days_2week > 0 else 0
 
         # Get latest session
         latest_session = None
         if results.get('sessions'):
-            latest = results['sessions'][0]
+            latest = max(results['sessions'], key=itemgetter('timestamp'))
             latest_session = {
                 'topic': latest.get('topic', 'Unknown'),
                 'duration_minutes': latest.get('duration_minutes', 0),
@@ -365,15 +646,14 @@ class SynthesisTracker:
             'last_7_days_total': summary.get('last_7_days_total', 0),
             'last_7_days_average': round(summary.get('last_7_days_avg', 0), 1),
             'last_4_weeks_average_weekly': round(summary.get('last_4_weeks_avg', 0), 1),
-            'last_2_weeks_average_weekly': round(sum(week.get('total_weekly_minutes', 0) for week in sorted_progress[:2]) / 2, 1) if len(sorted_progress) >= 2 else 0,
+            'last_2_weeks_average_weekly': round(weekly_2week / 2, 1) if len(sorted_progress) >= 2 else 0,
             'current_pace_vs_target': round(summary.get('current_pace_vs_target', 0), 1),
             'latest_session': latest_session,
             'last_updated': datetime.now().isoformat()
         }
 
         # Save HA metrics file
-        with open('ha_metrics.json', 'w') as f:
-            json.dump(ha_metrics, f, indent=2)
+        _write_json('ha_metrics.json', ha_metrics)
 
         print(f"✓ Saved ha_metrics.json")
         print(f"  - 4-week daily average: {ha_metrics['average_daily_minutes_4weeks']} minutes")
@@ -402,18 +682,133 @@ class SynthesisTracker:
         # Show recent activity
         if results['progress']:
             print("\nRecent Weekly Activity:")
-            for prog in sorted(results['progress'], key=lambda x: x['email_id'], reverse=True)[:3]:
+            for prog in heapq.nlargest(3, results['progress'], key=itemgetter('timestamp')):
                 daily = prog.get('daily_minutes', {})
                 total = prog.get('total_weekly_minutes', 0)
                 active_days = sum(1 for v in daily.values() if v > 0)
                 print(f"  • {total} min across {active_days} days")
 
+    def _split_messages(self, data):
+        """Group an imaplib FETCH response into one list of items per message"""
+        messages = []
+        for item in data:
+            head = item[0] if isinstance(item, tuple) else item
+            if not head:
+                continue
+            if _MESSAGE_START_RE.match(head):
+                messages.append([])
+            if messages:
+                messages[-1].append(item)
+        return messages
+
+    def _message_uid(self, message):
+        """UID of a FETCH response (servers may send it before or after literals)"""
+        for item in message:
+            head = item[0] if isinstance(item, tuple) else item
+            match = _UID_RE.search(head)
+            if match:
+                return int(match.group(1))
+        return None
+
+    def _message_literals(self, message):
+        """Map each BODY[section] of a FETCH response to its literal"""
+        literals = {}
+        for item in message:
+            if isinstance(item, tuple) and len(item) > 1:
+                names = _SECTION_RE.findall(item[0])
+                if names:
+                    literals[names[-1].decode().upper()] = item[1]
+        return literals
+
+    def _build_content(self, literals, parts):
+        """Assemble fetched header fields and text parts into a content dict"""
+        # Servers may echo the field list quoted or reordered, so match on the prefix
+        header = next(
+            (literal for section, literal in literals.items() if section.startswith('HEADER.FIELDS')),
+            b''
+        )
+        headers = _HEADER_PARSER.parsebytes(header)
+
+        # Extract content and metadata
+        content = {
+            'html': None,
+            'text': None,
+            'date': headers.get('Date', ''),
+            'subject': self._decode_header(headers.get('Subject', ''))
+        }
+
+        for kind, part in parts.items():
+            payload = literals.get(part['section'])
+            if payload:
+                content[kind] = self._decode_part(payload, part['encoding'], part['charset'])
+
+        return content
+
+    def _parse_response(self, data):
+        """Parse an imaplib response into nested lists of strings"""
+        # Inline literals as quoted strings so the response is one expression
+        raw = b''
+        for item in data:
+            if isinstance(item, tuple):
+                literal = item[1].replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+                raw += _LITERAL_RE.sub(b'', item[0]) + b'"' + literal + b'"'
+            elif item:
+                raw += item
+
+        stack = [[]]
+        for token in _TOKEN_RE.findall(raw):
+            if token == b'(':
+                stack.append([])
+            elif token == b')':
+                closed = stack.pop()
+                stack[-1].append(closed)
+            elif token.startswith(b'"'):
+                stack[-1].append(re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode('utf-8', errors='ignore'))
+            else:
+                stack[-1].append(None if token.upper() == b'NIL' else token.decode())
+        return stack[0]
+
+    def _text_parts(self, structure, section=''):
+        """Find the text/plain and text/html parts of a BODYSTRUCTURE"""
+        parts = {}
+        if structure and isinstance(structure[0], list):
+            # Multipart: child bodies come first, followed by the subtype
+            children = takewhile(lambda child: isinstance(child, list), structure)
+            for n, child in enumerate(children, 1):
+                child_section = f"{section}.{n}" if section else str(n)
+                for kind, part in self._text_parts(child, child_section).items():
+                    parts.setdefault(kind, part)
+        elif len(structure) > 5 and str(structure[0]).lower() == 'text':
+            kind = {'plain': 'text', 'html': 'html'}.get(str(structure[1]).lower())
+            if kind:
+                params = structure[2] or []
+                params = {str(k).lower(): v for k, v in zip(params[::2], params[1::2])}
+                parts[kind] = {
+                    'section': section or '1',
+                    'encoding': str(structure[5] or '7bit').lower(),
+                    'charset': params.get('charset') or 'utf-8'
+                }
+        return parts
+
+    def _decode_part(self, payload, encoding, charset):
+        """Undo the transfer encoding of a body part and decode it to text"""
+        if encoding == 'base64':
+            payload = base64.b64decode(payload)
+        elif encoding == 'quoted-printable':
+            payload = quopri.decodestring(payload)
+        try:
+            return payload.decode(charset, errors='ignore')
+        except LookupError:
+            return payload.decode('utf-8', errors='ignore')
+
     def _decode_header(self, header):
         """Decode email header"""
         if not header:
             return ""
-        decoded = decode_header(header)
-        return decoded[0][0].decode() if isinstance(decoded[0][0], bytes) else decoded[0][0]
+        # Plain subjects carry no RFC 2047 encoded words and decode to themselves
+        if '=?' not in header:
+            return header
+        return str(make_header(decode_header(header)))
 
 
 def main():
@@ -422,8 +817,16 @@ def main():
     parser.add_argument('--user', default='pierre@kazer.org', help='Email username')
     parser.add_argument('--password', default='mHrH9gsF', help='Email password')
     parser.add_argument('--config', help='Config file (alternative to command line)')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-fetch every email instead of reusing synthesis_data.json')
+    parser.add_argument('--since', type=date.fromisoformat,
+                        help='Only look at emails received on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--interval', type=float,
+                        help='Keep running and re-check for new emails every N minutes')
 
     args = parser.parse_args()
+    if args.interval is not None and not args.interval > 0:
+        parser.error('--interval must be a positive number of minutes')
 
     # Try to load config file if specified or exists
     if args.config:
@@ -447,7 +850,13 @@ def main():
 
     # Run tracker
     tracker = SynthesisTracker(server, username, password)
-    tracker.process_all()
+    if args.interval is not None:
+        try:
+            tracker.watch(args.interval * 60, reuse=not args.full, since=args.since)
+        except KeyboardInterrupt:
+            pass
+    else:
+        tracker.process_all(reuse=not args.full, since=args.since)
 
 
 if __name__ == "__main__":